@@ -0,0 +1,15 @@
+# scripts/prepare_end_sequence.py
+
+"""
+Pré-encode assets/fin_de_short.mp4 au format du Short (résolution, fps, réglages
+libx264 et audio identiques au rendu principal).
+
+Le fichier obtenu est concaténé par process_gameplay_clip sans décodage ni
+réencodage. À relancer si les réglages d'encodage changent.
+"""
+
+from process_video_gameplay import prepare_end_sequence
+
+if __name__ == "__main__":
+    output = prepare_end_sequence()
+    print(f"✅ Séquence de fin pré-encodée : {output}")
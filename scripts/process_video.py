@@ -1,10 +1,58 @@
+import math
 import os
 import sys
+import warnings
+from functools import lru_cache
 from typing import List, Optional
 
-from moviepy.editor import VideoFileClip, CompositeVideoClip, TextClip, ImageClip, ColorClip, concatenate_videoclips
+from moviepy.editor import VideoFileClip, CompositeVideoClip, ImageClip, ColorClip, concatenate_videoclips
 from moviepy.video.fx.all import crop, even_size, resize as moviepy_resize
-import numpy as np # Gardé car il pourrait être utile pour d'autres traitements futurs
+from moviepy.video.io.ffmpeg_reader import FFMPEG_VideoReader
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+
+class PooledFFMPEGVideoReader(FFMPEG_VideoReader):
+    """
+    Lecteur de frames MoviePy qui lit chaque frame dans un tampon pré-alloué (readinto)
+    au lieu d'allouer un nouveau ndarray (1080p RGB : ~6 Mo) à chaque frame.
+    Les tampons tournent : une frame reste valide pendant les POOL_SIZE - 1 lectures suivantes.
+    """
+    POOL_SIZE = 2
+
+    def read_frame(self):
+        if not hasattr(self, '_pool'):
+            w, h = self.size
+            self._pool = [np.empty((h, w, self.depth), dtype=np.uint8) for _ in range(self.POOL_SIZE)]
+            self._pool_index = 0
+
+        buf = self._pool[self._pool_index]
+        nread = self.proc.stdout.readinto(buf)
+        if nread != buf.nbytes:
+            # Même comportement que MoviePy : on réutilise la dernière frame valide
+            warnings.warn(
+                f"Warning: in file {self.filename}, {buf.nbytes} bytes wanted but {nread} bytes read, "
+                f"at frame {self.pos}/{self.nframes}. Using the last valid frame instead.",
+                UserWarning
+            )
+            if not hasattr(self, 'lastread'):
+                raise IOError(f"MoviePy error: failed to read the first frame of video file {self.filename}.")
+            return self.lastread
+
+        self._pool_index = (self._pool_index + 1) % self.POOL_SIZE
+        self.lastread = buf
+        return buf
+
+
+def load_clip(path: str) -> VideoFileClip:
+    """
+    Ouvre la vidéo avec MoviePy en remplaçant son lecteur par PooledFFMPEGVideoReader.
+    """
+    clip = VideoFileClip(path)
+    clip.reader.close()
+    clip.reader = PooledFFMPEGVideoReader(path)
+    return clip
+
 
 # ==============================================================================
 # ATTENTION : Vous DEVEZ implémenter cette fonction ou la remplacer par une logique
@@ -66,6 +114,64 @@ def crop_webcam(clip: VideoFileClip) -> Optional[VideoFileClip]:
     return crop(clip, x1=x1, y1=y1, x2=x, y2=y)
 
 
+@lru_cache(maxsize=None)
+def load_font(font: str, fontsize: int) -> ImageFont.ImageFont:
+    """
+    Charge une police TrueType une seule fois par couple (police, taille).
+    Si la police est introuvable, utilise la police par défaut de Pillow.
+    """
+    try:
+        return ImageFont.truetype(font, fontsize)
+    except OSError:
+        print(f"⚠️ Police '{font}' introuvable. Utilisation de la police par défaut de Pillow.")
+        return ImageFont.load_default()
+
+
+def wrap_text(text: str, font: ImageFont.ImageFont, max_width: int) -> str:
+    """
+    Découpe le texte en lignes qui tiennent dans max_width pixels (équivalent du method='caption').
+    """
+    lines = []
+    for word in text.split():
+        if lines and font.getlength(f"{lines[-1]} {word}") <= max_width:
+            lines[-1] = f"{lines[-1]} {word}"
+        else:
+            lines.append(word)
+    return "\n".join(lines)
+
+
+def create_text_clip(text: str, font: str, fontsize: int, stroke_width: float,
+                     color: str = "white", stroke_color: str = "black",
+                     max_width: Optional[int] = None) -> ImageClip:
+    """
+    Rend le texte (avec contour) une seule fois avec Pillow et le renvoie en ImageClip.
+    Remplace TextClip, qui lance un process ImageMagick à chaque texte.
+    """
+    font_obj = load_font(font, fontsize)
+    stroke = max(1, round(stroke_width))
+    if max_width:
+        text = wrap_text(text, font_obj, max_width)
+
+    # Mesure du texte (contour compris) pour dimensionner l'image au plus juste
+    measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    left, top, right, bottom = measure.multiline_textbbox(
+        (0, 0), text, font=font_obj, stroke_width=stroke, align="center"
+    )
+
+    # Pillow 9.x renvoie des coordonnées flottantes avec align="center" : arrondi vers l'extérieur
+    left, top = math.floor(left), math.floor(top)
+    right, bottom = math.ceil(right), math.ceil(bottom)
+
+    img = Image.new("RGBA", (max(1, right - left), max(1, bottom - top)), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    draw.multiline_text(
+        (-left, -top), text, font=font_obj, fill=color, align="center",
+        stroke_width=stroke, stroke_fill=stroke_color
+    )
+    # ImageClip utilise le canal alpha comme masque
+    return ImageClip(np.array(img))
+
+
 def trim_video_for_short(input_path, output_path, max_duration_seconds=60, clip_data=None, enable_webcam_crop=False):
     """
     Traite une vidéo pour le format Short (9:16) :
@@ -88,7 +194,7 @@ def trim_video_for_short(input_path, output_path, max_duration_seconds=60, clip_
     end_clip = None # Initialiser end_clip à None pour le finally
 
     try:
-        clip = VideoFileClip(input_path)
+        clip = load_clip(input_path)
         
         original_width, original_height = clip.size
         print(f"Résolution originale du clip : {original_width}x{original_height}")
@@ -122,13 +228,13 @@ def trim_video_for_short(input_path, output_path, max_duration_seconds=60, clip_
         font_path_regular = os.path.join(assets_dir, 'Roboto-Regular.ttf') # Exemple
         font_path_bold = os.path.join(assets_dir, 'Roboto-Bold.ttf')       # Exemple
 
-        # Si les fichiers de police ne sont pas trouvés, on utilise les polices par défaut de MoviePy
+        # Si les fichiers de police ne sont pas trouvés, on utilise les polices DejaVu du système
         if not os.path.exists(font_path_regular):
-            print(f"⚠️ Police '{font_path_regular}' non trouvée. Utilisation de la police par défaut de MoviePy pour le texte normal.")
-            font_path_regular = "sans" # Police par défaut de MoviePy
+            print(f"⚠️ Police '{font_path_regular}' non trouvée. Utilisation de DejaVuSans pour le texte normal.")
+            font_path_regular = "DejaVuSans.ttf" # Pillow la cherche dans les polices du système
         if not os.path.exists(font_path_bold):
-            print(f"⚠️ Police '{font_path_bold}' non trouvée. Utilisation de la police par défaut de MoviePy (bold) pour les titres.")
-            font_path_bold = "sans" # MoviePy tentera d'utiliser une version bold si "sans" est spécifié et une est dispo.
+            print(f"⚠️ Police '{font_path_bold}' non trouvée. Utilisation de DejaVuSans-Bold pour les titres.")
+            font_path_bold = "DejaVuSans-Bold.ttf"
 
         # Tu peux décommenter et utiliser la méthode 1 si tu es sûr de ton environnement.
         # Sinon, la méthode 2 (fournir des fichiers .ttf) est la plus robuste.
@@ -191,10 +297,9 @@ def trim_video_for_short(input_path, output_path, max_duration_seconds=60, clip_
         stroke_width = 1.5
         
         # Ajustements pour le titre : positionné un peu plus bas que le bord supérieur
-        title_clip = TextClip(title_text, fontsize=70, color=text_color,
-                              font=font_path_bold, stroke_color=stroke_color, stroke_width=stroke_width, # <--- ICI : Utilise font_path_bold
-                              size=(target_width * 0.9, None), # Texte sur 90% de la largeur
-                              method='caption') \
+        title_clip = create_text_clip(title_text, font_path_bold, 70, stroke_width, # <--- ICI : Utilise font_path_bold
+                                      color=text_color, stroke_color=stroke_color,
+                                      max_width=int(target_width * 0.9)) \
                      .set_duration(duration) \
                      .set_position(("center", int(target_height * 0.08))) # 8% de la hauteur du haut
 
@@ -203,8 +308,8 @@ def trim_video_for_short(input_path, output_path, max_duration_seconds=60, clip_
         # Ajustements pour le nom du streamer : positionné un peu plus haut que le bord inférieur
         # target_height * 0.92 place le HAUT du texte à 92% de la hauteur.
         # Soustraire 40 (taille approximative de la police) assure que le bas du texte est visible.
-        streamer_clip = TextClip(f"@{streamer_name}", fontsize=40, color=text_color,
-                                 font=font_path_regular, stroke_color=stroke_color, stroke_width=stroke_width) \
+        streamer_clip = create_text_clip(f"@{streamer_name}", font_path_regular, 40, stroke_width,
+                                         color=text_color, stroke_color=stroke_color) \
                         .set_duration(duration) \
                         .set_position(("center", int(target_height * 0.85) - 40)) 
         
@@ -274,6 +379,9 @@ def trim_video_for_short(input_path, output_path, max_duration_seconds=60, clip_
                                     temp_audiofile='temp-audio.m4a',
                                     remove_temp=True,
                                     fps=clip.fps, # Utilise le FPS du clip original pour la vidéo principale
+                                    preset="veryfast", # medium par défaut : 3 à 5x plus de CPU pour un gain invisible
+                                    threads=0,
+                                    ffmpeg_params=["-x264-params", "rc-lookahead=10"],
                                     logger=None)
         print(f"✅ Clip traité et sauvegardé : {output_path}")
         return output_path
@@ -2,30 +2,60 @@
 
 import sys
 import os
-
-from moviepy.editor import (
-    VideoFileClip,
-    CompositeVideoClip,
-    TextClip,
-    ImageClip,
-    concatenate_videoclips,
-    ColorClip
-)
-from moviepy.video.fx.resize import resize
-from moviepy.config import change_settings
-
-# 👇 Déclaration explicite du chemin vers ImageMagick (modifiable si nécessaire)
-change_settings({"IMAGEMAGICK_BINARY": "/usr/bin/convert"})
+import json
+import logging
+import subprocess
+import tempfile
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 
 # ------------------------------
 # Configuration globale
 # ------------------------------
 RESOLUTION    = (1080, 1920)  # (width, height)
 MAX_DURATION  = 180  # secondes
+OUTPUT_FPS    = 30
+PIX_FMT       = "yuv420p"  # tout le montage reste en YUV 4:2:0 (1,5 octet/pixel contre 3 en RGB)
+AUDIO_RATE    = 48000
+AUDIO_ARGS    = ["-c:a", "aac", "-ar", str(AUDIO_RATE), "-ac", "2"]
 WEBCAM_COORDS = {'x1': 5, 'y1': 8, 'x2': 542, 'y2': 282}
+GAME_Y        = int(RESOLUTION[1] * 0.33)  # la zone de jeu commence sous la webcam
+GAME_H        = int(RESOLUTION[1] * 0.67)
 ASSETS_DIR    = os.path.join(os.path.dirname(__file__), '..', 'assets')
 OUTPUT_FILE   = None  # on écrira vers le chemin passé en argument
 
+# Séquence de fin pré-encodée (scripts/prepare_end_sequence.py) : concaténée sans réencodage
+END_SEQUENCE_BAKED = os.path.join(
+    ASSETS_DIR, f"fin_de_short_{RESOLUTION[0]}x{RESOLUTION[1]}_{OUTPUT_FPS}fps.mp4"
+)
+_END_SEQUENCE_BAKED_OK = None
+FFMPEG_BINARY  = "ffmpeg"
+FFPROBE_BINARY = "ffprobe"
+VAAPI_DEVICE  = "/dev/dri/renderD128"
+
+# Encodeurs H.264 par ordre de préférence (matériel d'abord, libx264 en secours)
+H264_ENCODERS = ["h264_nvenc", "h264_qsv", "h264_vaapi"]
+_H264_ENCODER = None
+
+# Montage sur GPU (NVDEC + overlay_cuda) quand NVENC est utilisé : voir cuda_compositing_available()
+CUDA_DEVICE = "gpu"
+CUDA_GLOBAL_ARGS = ["-init_hw_device", f"cuda={CUDA_DEVICE}", "-filter_hw_device", CUDA_DEVICE]
+_CUDA_COMPOSITING = None
+
+# libx264 : veryfast, lookahead raccourci (40 -> 10 frames, peu d'impact à ce débit)
+X264_ARGS = ["-preset", "veryfast", "-x264-params", "rc-lookahead=10"]
+
+# Threads pour le parallel_for_ d'OpenCV (détection de visage)
+OPENCV_THREADS = min(4, os.cpu_count() or 1)
+
+# Threads par worker quand plusieurs clips sont traités en parallèle (process_many)
+WORKER_THREADS = 2
+
+# Threads de libx264 et des filtres ffmpeg (0 = tous les cœurs) ; WORKER_THREADS dans les workers
+FFMPEG_THREADS = 0
+
+logger = logging.getLogger(__name__)
+
 # ------------------------------
 # Import OpenCV (avec message clair si absent)
 # ------------------------------
@@ -34,83 +64,562 @@ try:
 except Exception as e:
     cv2 = None
     _cv2_import_error = e
+else:
+    # Chemins SIMD + parallel_for_ (les wheels pip sont compilées avec le backend pthreads)
+    cv2.setUseOptimized(True)
+    cv2.setNumThreads(OPENCV_THREADS)
+    if logger.isEnabledFor(logging.DEBUG):
+        for _line in cv2.getBuildInformation().splitlines():
+            if "Parallel framework" in _line:
+                logger.debug("OpenCV %s (%d threads)", _line.strip(), cv2.getNumThreads())
+
+# ONNX Runtime (optionnel) : classifieur visage / pas de visage quantifié int8
+try:
+    import onnxruntime as ort
+except Exception:
+    ort = None
+
+_FACE_CASCADE = None
+_FACE_DETECTOR = None
+_FACE_CLASSIFIER = None
+
+# Classifieur int8 (entrée 1x3x128x128 RGB dans [0, 1], dernière sortie = probabilité visage),
+# prioritaire s'il est déposé dans assets/ et que onnxruntime est installé.
+FACE_CLASSIFIER_MODEL = os.path.join(ASSETS_DIR, "face_classifier_int8.onnx")
+FACE_CLASSIFIER_SIZE = 128
+FACE_CLASSIFIER_THRESHOLD = 0.5
+
+# Détecteur YuNet (réseau de neurones, noyaux SIMD d'OpenCV) : à déposer dans assets/.
+# Sans ce modèle (ou avec un OpenCV trop ancien), on reste sur le cascade Haar.
+YUNET_MODEL = os.path.join(ASSETS_DIR, "face_detection_yunet_2023mar.onnx")
+
+# Taille de la ROI webcam pour la détection (oui/non : inutile de garder la pleine résolution)
+FACE_ROI_WIDTH  = 256
+FACE_ROI_HEIGHT = int(FACE_ROI_WIDTH * (WEBCAM_COORDS['y2'] - WEBCAM_COORDS['y1'])
+                      / (WEBCAM_COORDS['x2'] - WEBCAM_COORDS['x1']))
+
+# Tampons réutilisés d'un appel à l'autre : ffmpeg écrit la ROI directement dedans (readinto)
+_ROI_BUF  = np.empty((FACE_ROI_HEIGHT, FACE_ROI_WIDTH, 3), np.uint8)
+_ROI_GRAY = np.empty((FACE_ROI_HEIGHT, FACE_ROI_WIDTH), np.uint8)
+_ROI_RGB  = np.empty((FACE_CLASSIFIER_SIZE, FACE_CLASSIFIER_SIZE, 3), np.uint8)
+
+# Instant de la frame analysée : à t=0 les clips Twitch sont souvent noirs / en chargement
+FACE_SAMPLE_TIME = 0.5
 
 # ------------------------------
 # Fonctions utilitaires
 # ------------------------------
-def load_clip(path):
-    clip = VideoFileClip(path)
-    if clip.duration > MAX_DURATION:
-        clip = clip.subclip(0, MAX_DURATION)
-    return clip
+def probe_video(path):
+    """
+    Retourne les métadonnées ffprobe du fichier (clés 'format' et 'streams').
+    """
+    result = subprocess.run(
+        [FFPROBE_BINARY, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe n'a pas pu lire {path}: {result.stderr.strip()}")
+    return json.loads(result.stdout)
 
-def create_background(duration):
+def _escape_filter_value(value):
+    """
+    Échappe une valeur d'option pour un filtergraph ffmpeg (-filter_complex).
+    Deux niveaux : l'option du filtre (':'), puis la description du graphe.
+    """
+    for ch in "\\':":
+        value = value.replace(ch, "\\" + ch)
+    for ch in "\\'[],;":
+        value = value.replace(ch, "\\" + ch)
+    return value
+
+def _font_path(font):
+    path = os.path.join(ASSETS_DIR, font)
+    return path if os.path.exists(path) else None
+
+def create_background_input():
+    # Image de fond (ou fond noir si absente), arguments d'entrée ffmpeg
     bg_path = os.path.join(ASSETS_DIR, "fond_short.png")
     if os.path.exists(bg_path):
-        bg = ImageClip(bg_path).resize(RESOLUTION)
-    else:
-        bg = ColorClip(RESOLUTION, color=(0, 0, 0))
-    return bg.set_duration(duration)
-
-def extract_webcam(clip):
-    # Découpage de la zone webcam et redimensionnement pour la placer en haut
-    cam = clip.crop(
-        x1=WEBCAM_COORDS['x1'], y1=WEBCAM_COORDS['y1'],
-        x2=WEBCAM_COORDS['x2'], y2=WEBCAM_COORDS['y2']
+        return ["-i", bg_path]
+    return ["-f", "lavfi", "-i", f"color=c=black:s={RESOLUTION[0]}x{RESOLUTION[1]}:r={OUTPUT_FPS}"]
+
+def background_filter(src, dst):
+    """
+    L'image de fond est décodée, redimensionnée et convertie une seule fois,
+    puis la frame obtenue est répétée (loop) au lieu d'être retraitée à chaque frame.
+    """
+    return (
+        f"[{src}]scale={RESOLUTION[0]}:{RESOLUTION[1]}:flags=area,format={PIX_FMT},"
+        f"loop=loop=-1:size=1,fps={OUTPUT_FPS}[{dst}]"
     )
-    cam = cam.resize(height=int(RESOLUTION[1] * 0.33))
-    x_pos = (RESOLUTION[0] - cam.w) // 2
-    return cam.set_position((x_pos, 0))
 
-def extract_gameplay(clip):
-    # Zone de jeu sous la webcam (d'après ton code existant)
-    game = clip.crop(y1=WEBCAM_COORDS['y2'], y2=clip.h)
-    game = game.resize(height=int(RESOLUTION[1] * 0.67))
-    x_pos = (RESOLUTION[0] - game.w) // 2
-    y_pos = int(RESOLUTION[1] * 0.33)
-    return game.set_position((x_pos, y_pos))
+def _even(value):
+    # Dimension paire la plus proche (exigée par yuv420p)
+    return max(2, int(round(value / 2)) * 2)
+
+def webcam_size():
+    # Taille de la webcam une fois placée en haut du Short
+    w = WEBCAM_COORDS['x2'] - WEBCAM_COORDS['x1']
+    h = WEBCAM_COORDS['y2'] - WEBCAM_COORDS['y1']
+    cam_h = int(RESOLUTION[1] * 0.33)
+    return _even(w * cam_h / h), cam_h
 
-def full_screen_clip(clip):
+def webcam_filter(src, dst):
+    """
+    Découpage de la zone webcam et redimensionnement pour la placer en haut.
+    Retourne le filtre crop+scale fusionné et la position (x, y) de l'overlay.
+    """
+    w = WEBCAM_COORDS['x2'] - WEBCAM_COORDS['x1']
+    h = WEBCAM_COORDS['y2'] - WEBCAM_COORDS['y1']
+    cam_w, cam_h = webcam_size()
+    chain = f"[{src}]crop={w}:{h}:{WEBCAM_COORDS['x1']}:{WEBCAM_COORDS['y1']},scale={cam_w}:{cam_h}[{dst}]"
+    return chain, ((RESOLUTION[0] - cam_w) // 2, 0)
+
+def webcam_cuvid_geometry(src_w, src_h):
+    """
+    Découpe décodeur (haut, bas, gauche, droite), taille et position x de la webcam pour la
+    variante GPU. overlay_cuda n'accepte pas de position négative : la partie de la webcam
+    qui dépasserait du Short est retirée dès le décodage.
+    """
+    x1, y1, x2, y2 = WEBCAM_COORDS['x1'], WEBCAM_COORDS['y1'], WEBCAM_COORDS['x2'], WEBCAM_COORDS['y2']
+    cam_w, cam_h = webcam_size()
+    trim = 0
+    if cam_w > RESOLUTION[0]:
+        trim = int(round((cam_w - RESOLUTION[0]) / 2 * (x2 - x1) / cam_w))
+        cam_w = RESOLUTION[0]
+    crop = (y1, src_h - y2, x1 + trim, src_w - x2 + trim)
+    return crop, (cam_w, cam_h), (RESOLUTION[0] - cam_w) // 2
+
+def gameplay_geometry(src_w, src_h):
+    """
+    Zone de jeu sous la webcam (d'après ton code existant).
+    Seule la partie qui sera visible à l'écran est découpée avant le redimensionnement.
+    Retourne les valeurs à injecter dans _FILTER_FACE.
+    """
+    crop_h = src_h - WEBCAM_COORDS['y2']
+    game_w = _even(src_w * GAME_H / crop_h)
+    crop_w = src_w
+    if game_w > RESOLUTION[0]:
+        crop_w = min(src_w, _even(RESOLUTION[0] * crop_h / GAME_H))
+        game_w = RESOLUTION[0]
+    return {
+        'game_crop_w': crop_w, 'game_crop_h': crop_h, 'game_crop_x': (src_w - crop_w) // 2,
+        'game_w': game_w, 'game_x': (RESOLUTION[0] - game_w) // 2,
+    }
+
+def full_screen_geometry(src_w, src_h):
     """
     Zoom centré pour remplir totalement RESOLUTION à partir du centre du clip originel.
-    On redimensionne par hauteur puis on crop center (simule un zoom vertical centré).
+    On découpe au centre la zone au ratio du Short, puis on la redimensionne (un seul passage).
+    Retourne les valeurs à injecter dans _FILTER_NOFACE.
     """
-    c = clip.resize(height=RESOLUTION[1])
-    c = c.crop(
-        x_center=c.w/2, width=RESOLUTION[0],
-        y_center=c.h/2, height=RESOLUTION[1]
-    )
-    return c.set_position((0, 0))
+    crop_w, crop_h = src_w, src_h
+    if src_w * RESOLUTION[1] > src_h * RESOLUTION[0]:
+        crop_w = _even(src_h * RESOLUTION[0] / RESOLUTION[1])
+    else:
+        crop_h = _even(src_w * RESOLUTION[1] / RESOLUTION[0])
+    return {
+        'zoom_crop_w': crop_w, 'zoom_crop_h': crop_h,
+        'zoom_crop_x': (src_w - crop_w) // 2, 'zoom_crop_y': (src_h - crop_h) // 2,
+    }
 
-def create_text_clip(text, font, size, stroke, y_pos, duration):
-    try:
-        txt = TextClip(
-            text, fontsize=size, font=font,
-            color='white', stroke_color='black', stroke_width=stroke
-        )
-    except Exception:
-        # si la font n'est pas trouvée, MoviePy utilisera une font par défaut
-        txt = TextClip(
-            text, fontsize=size,
-            color='white', stroke_color='black', stroke_width=stroke
+def source_fps_filter(video_stream):
+    """
+    Rééchantillonnage en tête de graphe (60 -> 30 fps : moitié moins de frames à découper/redimensionner).
+    Rien à faire si la source est déjà à OUTPUT_FPS.
+    """
+    if video_stream.get('r_frame_rate') == f"{OUTPUT_FPS}/1":
+        return ""
+    return f"fps={OUTPUT_FPS},"
+
+def text_filter(text, font, size, stroke, y_pos):
+    # drawtext : texte blanc contour noir, centré horizontalement
+    y = {'top': "0", 'bottom': "h-th"}.get(y_pos, str(y_pos))
+    options = [
+        f"text={_escape_filter_value(text)}",
+        "expansion=none",
+        f"fontsize={size}",
+        "fontcolor=white",
+        "bordercolor=black",
+        f"borderw={max(1, round(stroke))}",
+        "x=(w-tw)/2",
+        f"y={y}",
+    ]
+    font_path = _font_path(font)
+    if font_path:
+        # si la font n'est pas trouvée, ffmpeg utilisera une font par défaut
+        options.insert(0, f"fontfile={_escape_filter_value(font_path)}")
+    return "drawtext=" + ":".join(options)
+
+def end_sequence_path():
+    end_path = os.path.join(ASSETS_DIR, "fin_de_short.mp4")
+    return end_path if os.path.exists(end_path) else None
+
+def end_sequence_filter():
+    # Mise au format du Short (taille, pixels, fps) de la séquence de fin
+    return f"scale={RESOLUTION[0]}:{RESOLUTION[1]},format={PIX_FMT},fps={OUTPUT_FPS},setsar=1"
+
+def prepare_end_sequence():
+    """
+    Pré-encode fin_de_short.mp4 au format du Short avec les mêmes réglages libx264
+    et audio que le rendu principal, pour pouvoir la concaténer sans réencodage.
+    """
+    end_path = end_sequence_path()
+    if not end_path:
+        raise RuntimeError("Séquence de fin introuvable dans assets/")
+    _, _, encoder_args = h264_encoder_options("libx264")
+    _run_ffmpeg(["-i", end_path, "-vf", end_sequence_filter()] + encoder_args + AUDIO_ARGS + [END_SEQUENCE_BAKED])
+    return END_SEQUENCE_BAKED
+
+def baked_end_sequence(encoder):
+    """
+    Retourne la séquence de fin pré-encodée si ses paramètres correspondent au
+    rendu principal (concat demuxer en copie de flux possible), sinon None.
+    """
+    global _END_SEQUENCE_BAKED_OK
+    # Les encodeurs matériels ne produisent pas le même flux H.264 que libx264
+    if encoder != "libx264" or not os.path.exists(END_SEQUENCE_BAKED):
+        return None
+    if _END_SEQUENCE_BAKED_OK is None:
+        streams = probe_video(END_SEQUENCE_BAKED)['streams']
+        video = next((s for s in streams if s.get('codec_type') == 'video'), {})
+        audio = next((s for s in streams if s.get('codec_type') == 'audio'), {})
+        _END_SEQUENCE_BAKED_OK = (
+            video.get('codec_name') == 'h264'
+            and (video.get('width'), video.get('height')) == RESOLUTION
+            and video.get('pix_fmt') == PIX_FMT
+            and video.get('r_frame_rate') == f"{OUTPUT_FPS}/1"
+            and audio.get('codec_name') == 'aac'
+            and audio.get('sample_rate') == str(AUDIO_RATE)
+            and audio.get('channels') == 2
         )
-    return txt.set_position(('center', y_pos)).set_duration(duration)
+        if not _END_SEQUENCE_BAKED_OK:
+            print(f"⚠️ {os.path.basename(END_SEQUENCE_BAKED)} ne correspond pas au rendu, réencodage de la fin.")
+    return END_SEQUENCE_BAKED if _END_SEQUENCE_BAKED_OK else None
 
-def append_end_sequence(main_clip):
-    end_path = os.path.join(ASSETS_DIR, "fin_de_short.mp4")
-    if os.path.exists(end_path):
-        end_clip = VideoFileClip(end_path).resize(RESOLUTION)
-        return concatenate_videoclips([main_clip, end_clip])
-    return main_clip
+def concat_stream_copy(paths, output_path):
+    """
+    Concatène des MP4 aux paramètres identiques sans décodage ni réencodage (concat demuxer).
+    """
+    list_path = f"{os.path.splitext(output_path)[0]}_concat.txt"
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for path in paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    try:
+        _run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", output_path])
+    finally:
+        os.remove(list_path)
+
+def _run_ffmpeg(args):
+    cmd = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-stats", "-y"] + args
+    result = subprocess.run(cmd)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg a échoué (code {result.returncode})")
+
+def _encoder_works(encoder):
+    # ffmpeg -encoders liste aussi les encodeurs compilés sans GPU présent : on fait un essai réel
+    global_args, hw_filter, output_args = h264_encoder_options(encoder)
+    cmd = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error"] + global_args
+    cmd += ["-f", "lavfi", "-i", "color=c=black:s=256x256:d=0.1"]
+    if hw_filter:
+        cmd += ["-vf", hw_filter]
+    cmd += output_args + ["-f", "null", "-"]
+    try:
+        return subprocess.run(cmd, capture_output=True).returncode == 0
+    except OSError:
+        return False
+
+def get_h264_encoder():
+    """
+    Retourne le premier encodeur H.264 matériel utilisable (NVENC, QSV, VAAPI),
+    sinon libx264. Le résultat est mis en cache pour tout le process.
+    """
+    global _H264_ENCODER
+    if _H264_ENCODER is None:
+        try:
+            listing = subprocess.run(
+                [FFMPEG_BINARY, "-hide_banner", "-encoders"],
+                capture_output=True, text=True
+            ).stdout
+        except OSError:
+            listing = ""
+        _H264_ENCODER = "libx264"
+        for encoder in H264_ENCODERS:
+            if encoder in listing and _encoder_works(encoder):
+                _H264_ENCODER = encoder
+                break
+        print(f"🎞️  Encodeur H.264 utilisé : {_H264_ENCODER}")
+        if _H264_ENCODER == "libx264":
+            _check_x264_asm()
+    return _H264_ENCODER
+
+def _check_x264_asm():
+    # x264 annonce ses jeux d'instructions au niveau info ("using cpu capabilities: ... AVX2 ...")
+    cmd = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "info", "-f", "lavfi",
+           "-i", "color=c=black:s=64x64:d=0.04", "-c:v", "libx264", "-f", "null", "-"]
+    try:
+        stderr = subprocess.run(cmd, capture_output=True, text=True).stderr
+    except OSError:
+        return
+    for line in stderr.splitlines():
+        if "using cpu capabilities" in line:
+            caps = line.split("using cpu capabilities:", 1)[1].strip()
+            if caps.startswith("none"):
+                print("⚠️ libx264 compilé sans assembleur (SIMD) : encodage CPU très lent.")
+            else:
+                logger.debug("libx264 : %s", caps)
+            return
+
+def cuda_compositing_available():
+    """
+    True si ffmpeg peut décoder (h264_cuvid), composer (overlay_cuda) et rester sur le GPU
+    jusqu'au texte. Essai réel mis en cache, comme pour les encodeurs : un court clip H.264
+    (encodé avec NVENC) passe dans cuvid_input + _FILTER_FACE_CUDA, comme un vrai rendu.
+    """
+    global _CUDA_COMPOSITING
+    if _CUDA_COMPOSITING is None:
+        _CUDA_COMPOSITING = False
+        try:
+            hwaccels = subprocess.run(
+                [FFMPEG_BINARY, "-hide_banner", "-hwaccels"], capture_output=True, text=True
+            ).stdout
+            decoders = subprocess.run(
+                [FFMPEG_BINARY, "-hide_banner", "-decoders"], capture_output=True, text=True
+            ).stdout
+            if "cuda" in hwaccels.split() and "h264_cuvid" in decoders:
+                with tempfile.TemporaryDirectory() as tmp:
+                    clip = os.path.join(tmp, "cuda_test.mp4")
+                    cmd = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-f", "lavfi",
+                           "-i", "testsrc=s=256x144:r=60:d=0.1", "-c:v", "h264_nvenc", "-y", clip]
+                    if subprocess.run(cmd, capture_output=True).returncode == 0:
+                        graph = _FILTER_FACE_CUDA.format(src_fps=f"fps={OUTPUT_FPS},", texts="null",
+                                                         cam_x=0, game_x=0)
+                        cmd = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error"] + CUDA_GLOBAL_ARGS
+                        cmd += cuvid_input(clip, (3, 3, 5, 5), (97, 55)) + cuvid_input(clip, (8, 0, 0, 0), (128, 64))
+                        cmd += ["-f", "lavfi", "-i", "color=c=black:s=256x256:d=0.1",
+                                "-filter_complex", graph, "-map", "[main_v]", "-f", "null", "-"]
+                        _CUDA_COMPOSITING = subprocess.run(cmd, capture_output=True).returncode == 0
+        except OSError:
+            pass
+        if _CUDA_COMPOSITING:
+            print("🎞️  Montage sur GPU (NVDEC + overlay_cuda)")
+    return _CUDA_COMPOSITING
+
+def cuvid_input(input_path, crop, size):
+    """
+    Arguments d'entrée décodant le clip avec NVDEC, découpe et redimensionnement faits
+    par le décodeur : crop = (haut, bas, gauche, droite) en pixels retirés, size = (w, h).
+    NVDEC travaille en 4:2:0 : découpe arrondie au pair inférieur, taille au pair supérieur.
+    """
+    top, bottom, left, right = (c - c % 2 for c in crop)
+    w, h = (v + v % 2 for v in size)
+    return [
+        "-hwaccel", "cuda", "-hwaccel_device", CUDA_DEVICE, "-hwaccel_output_format", "cuda",
+        "-c:v", "h264_cuvid", "-crop", f"{top}x{bottom}x{left}x{right}", "-resize", f"{w}x{h}",
+        "-t", str(MAX_DURATION), "-i", input_path,
+    ]
+
+def h264_encoder_options(encoder):
+    """
+    Retourne (options globales, filtre final, options de sortie) pour l'encodeur.
+    Le filtre final sert à VAAPI, qui attend des frames déjà envoyées sur le GPU.
+    """
+    if encoder == "h264_nvenc":
+        return [], None, [
+            "-c:v", "h264_nvenc", "-preset", "p4", "-rc", "vbr", "-cq", "23", "-b:v", "6M",
+            "-pix_fmt", PIX_FMT
+        ]
+    if encoder == "h264_qsv":
+        return [], None, [
+            "-c:v", "h264_qsv", "-preset", "veryfast", "-b:v", "6M", "-pix_fmt", "nv12"
+        ]
+    if encoder == "h264_vaapi":
+        return ["-vaapi_device", VAAPI_DEVICE], "format=nv12,hwupload", [
+            "-c:v", "h264_vaapi", "-b:v", "6M"
+        ]
+    return [], None, ["-c:v", "libx264", "-threads", str(FFMPEG_THREADS)] + X264_ARGS + ["-pix_fmt", PIX_FMT]
 
 # ------------------------------
-# Détection du visage sur la 1ère frame (dans la zone webcam)
+# Graphes de filtres précalculés (les deux mises en page possibles)
+# ------------------------------
+# Tout ce qui ne dépend que de RESOLUTION / WEBCAM_COORDS est figé à l'import :
+# par vidéo il ne reste qu'à remplir la cadence et la géométrie de la source, et les textes.
+# Entrées : 0 = clip source, 1 = image de fond (mise en page avec webcam uniquement).
+_CAM_CHAIN, (_CAM_X, _CAM_Y) = webcam_filter("cam_src", "cam")
+
+_FILTER_FACE = ";".join([
+    f"[0:v]{{src_fps}}format={PIX_FMT},split=2[cam_src][game_src]",
+    _CAM_CHAIN,
+    f"[game_src]crop={{game_crop_w}}:{{game_crop_h}}:{{game_crop_x}}:{WEBCAM_COORDS['y2']},"
+    f"scale={{game_w}}:{GAME_H}[game]",
+    background_filter("1:v", "bg"),
+    f"[bg][game]overlay=x={{game_x}}:y={GAME_Y}:eval=init:shortest=1:format=yuv420[base]",
+    f"[base][cam]overlay=x={_CAM_X}:y={_CAM_Y}:eval=init:format=yuv420[composed]",
+    "[composed]{texts},setsar=1[main_v]",
+])
+
+_FILTER_NOFACE = ";".join([
+    f"[0:v]{{src_fps}}format={PIX_FMT},crop={{zoom_crop_w}}:{{zoom_crop_h}}:{{zoom_crop_x}}:{{zoom_crop_y}},"
+    f"scale={RESOLUTION[0]}:{RESOLUTION[1]}[composed]",
+    "[composed]{texts},setsar=1[main_v]",
+])
+
+# Variantes GPU : le crop/scale est fait par h264_cuvid (une entrée décodée par couche), le fond
+# est envoyé une seule fois sur le GPU (hwupload sur -filter_hw_device, le même contexte CUDA
+# que NVDEC) puis répété. Les frames ne redescendent qu'une fois,
+# juste avant drawtext (pas d'équivalent CUDA). NVDEC décode quand même chaque frame des
+# deux entrées (le H.264 ne permet pas d'en sauter) : le fps en tête ne réduit que la suite.
+# Entrées : 0 = webcam (ou plein écran), 1 = zone de jeu, 2 = image de fond.
+_FILTER_FACE_CUDA = ";".join([
+    "[0:v]{src_fps}null[cam]",
+    "[1:v]{src_fps}null[game]",
+    f"[2:v]scale={RESOLUTION[0]}:{RESOLUTION[1]}:flags=area,format=nv12,hwupload,"
+    f"loop=loop=-1:size=1,fps={OUTPUT_FPS}[bg]",
+    f"[bg][game]overlay_cuda=x={{game_x}}:y={GAME_Y}:shortest=1[base]",
+    f"[base][cam]overlay_cuda=x={{cam_x}}:y={_CAM_Y}[composed]",
+    f"[composed]hwdownload,format=nv12,format={PIX_FMT},{{texts}},setsar=1[main_v]",
+])
+
+_FILTER_NOFACE_CUDA = (
+    f"[0:v]{{src_fps}}hwdownload,format=nv12,format={PIX_FMT},{{texts}},setsar=1[main_v]"
+)
+
 # ------------------------------
-def is_face_in_webcam_zone(clip):
+# Détection du visage sur une frame échantillon (dans la zone webcam)
+# ------------------------------
+def _get_face_cascade():
+    """
+    Charge le cascade Haar frontal (fourni par opencv) une seule fois par process.
+    """
+    global _FACE_CASCADE
+    if _FACE_CASCADE is None:
+        cascade_path = os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml')
+        if not os.path.exists(cascade_path):
+            raise RuntimeError(f"Haarcascade introuvable à {cascade_path}")
+        _FACE_CASCADE = cv2.CascadeClassifier(cascade_path)
+    return _FACE_CASCADE
+
+def _get_face_detector():
+    """
+    Construit le détecteur YuNet une seule fois par process.
+    Retourne None si le modèle ou cv2.FaceDetectorYN ne sont pas disponibles.
+    """
+    global _FACE_DETECTOR
+    if _FACE_DETECTOR is None:
+        _FACE_DETECTOR = False
+        if os.path.exists(YUNET_MODEL) and hasattr(cv2, "FaceDetectorYN"):
+            try:
+                _FACE_DETECTOR = cv2.FaceDetectorYN.create(YUNET_MODEL, "", (FACE_ROI_WIDTH, FACE_ROI_HEIGHT),
+                                                           score_threshold=0.7)
+            except cv2.error as e:
+                print(f"⚠️ YuNet indisponible ({e}), utilisation du cascade Haar.")
+    return _FACE_DETECTOR or None
+
+def _get_face_classifier():
+    """
+    Ouvre la session ONNX Runtime du classifieur une seule fois par process.
+    Retourne None si onnxruntime ou le modèle ne sont pas disponibles.
+    """
+    global _FACE_CLASSIFIER
+    if _FACE_CLASSIFIER is None:
+        _FACE_CLASSIFIER = False
+        if ort is not None and os.path.exists(FACE_CLASSIFIER_MODEL):
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            # Une seule image 128x128 : un thread suffit et ne gêne pas process_many
+            options.intra_op_num_threads = 1
+            try:
+                session = ort.InferenceSession(
+                    FACE_CLASSIFIER_MODEL, sess_options=options, providers=["CPUExecutionProvider"]
+                )
+                _check_face_classifier(session)
+                _FACE_CLASSIFIER = session
+            except Exception as e:
+                print(f"⚠️ Classifieur ONNX indisponible ({e}), utilisation d'OpenCV.")
+    return _FACE_CLASSIFIER or None
+
+def _check_face_classifier(session):
+    """
+    Vérifie que le modèle respecte le contrat attendu par is_face_in_webcam_zone :
+    une entrée float 1x3xNxN (N = FACE_CLASSIFIER_SIZE, lot éventuellement symbolique)
+    et une sortie d'une ou deux valeurs. Lève ValueError sinon.
+    """
+    inputs, outputs = session.get_inputs(), session.get_outputs()
+    expected = f"1x3x{FACE_CLASSIFIER_SIZE}x{FACE_CLASSIFIER_SIZE} float"
+    if len(inputs) != 1 or inputs[0].type != "tensor(float)":
+        raise ValueError(f"entrée attendue : {expected}")
+    shape = list(inputs[0].shape)
+    if len(shape) != 4 or shape[1:] != [3, FACE_CLASSIFIER_SIZE, FACE_CLASSIFIER_SIZE] \
+            or shape[0] not in (1, None) and not isinstance(shape[0], str):
+        raise ValueError(f"entrée {inputs[0].shape} au lieu de {expected}")
+    if not outputs or outputs[0].type != "tensor(float)" or outputs[0].shape[-1:] not in ([1], [2]):
+        raise ValueError(f"sortie {outputs[0].shape if outputs else None} au lieu d'une ou deux probabilités")
+
+def _classify_face(classifier, input_path):
+    """
+    Probabilité visage du classifieur ONNX, ou None si l'inférence échoue ou si la sortie
+    n'est pas une probabilité (logits) : le classifieur est alors désactivé pour le process.
+    """
+    global _FACE_CLASSIFIER
+    roi = _sample_webcam_roi(input_path, "rgb24", _ROI_RGB)
+    # HWC uint8 -> NCHW float32 dans [0, 1]
+    x = roi.transpose(2, 0, 1)[np.newaxis].astype(np.float32) / 255.0
+    try:
+        scores = np.ravel(classifier.run(None, {classifier.get_inputs()[0].name: x})[0])
+        if scores.size not in (1, 2) or scores.min() < 0 or scores.max() > 1:
+            raise ValueError(f"sortie {scores} hors de [0, 1]")
+    except Exception as e:
+        print(f"⚠️ Classifieur ONNX indisponible ({e}), utilisation d'OpenCV.")
+        _FACE_CLASSIFIER = False
+        return None
+    return float(scores[-1])
+
+def _read_webcam_roi(input_path, pix_fmt, buf, seek_seconds):
+    """
+    Extrait la zone webcam d'une seule frame via ffmpeg (seek + crop + réduction côté ffmpeg),
+    lue directement dans buf (taille et nombre de canaux de buf, au format pix_fmt).
+    None si aucune frame à cet instant. Le tampon renvoyé est écrasé par l'appel suivant.
+    """
+    x1, y1, x2, y2 = WEBCAM_COORDS['x1'], WEBCAM_COORDS['y1'], WEBCAM_COORDS['x2'], WEBCAM_COORDS['y2']
+    # Le crop est borné à la taille réelle de la frame (sources plus petites que prévu)
+    vf = (f"crop=min({x2 - x1}\\,iw-{x1}):min({y2 - y1}\\,ih-{y1}):{x1}:{y1},"
+          f"scale={buf.shape[1]}:{buf.shape[0]}:flags=area")
+    cmd = [
+        FFMPEG_BINARY, "-hide_banner", "-loglevel", "error",
+        "-ss", str(seek_seconds), "-i", input_path,
+        "-frames:v", "1", "-an", "-vf", vf,
+        "-f", "rawvideo", "-pix_fmt", pix_fmt, "-"
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    nread = proc.stdout.readinto(buf)
+    _, stderr = proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg n'a pas pu extraire la zone webcam de {input_path}: "
+                           f"{stderr.decode(errors='replace').strip()}")
+    return buf if nread == buf.nbytes else None
+
+def _sample_webcam_roi(input_path, pix_fmt, buf):
+    # Frame à FACE_SAMPLE_TIME, ou la première si le clip est plus court
+    roi = _read_webcam_roi(input_path, pix_fmt, buf, FACE_SAMPLE_TIME)
+    if roi is None:
+        roi = _read_webcam_roi(input_path, pix_fmt, buf, 0)
+    if roi is None:
+        raise RuntimeError(f"Impossible d'extraire une frame de {input_path}")
+    return roi
+
+def is_face_in_webcam_zone(input_path):
     """
     Retourne True si au moins un visage est détecté DANS la zone WEBCAM_COORDS
-    sur la première frame du clip. Utilise OpenCV Haarcascade.
+    sur la frame à FACE_SAMPLE_TIME de la vidéo. Utilise le classifieur ONNX int8
+    s'il est présent, sinon YuNet, sinon OpenCV Haarcascade.
     """
+    classifier = _get_face_classifier()
+    if classifier is not None:
+        score = _classify_face(classifier, input_path)
+        if score is not None:
+            return score > FACE_CLASSIFIER_THRESHOLD
+
     if cv2 is None:
         raise RuntimeError(
             "OpenCV (cv2) n'est pas installé. Ajoute 'opencv-python-headless' "
@@ -118,40 +627,31 @@ def is_face_in_webcam_zone(clip):
             f"Import error: {_cv2_import_error}"
         )
 
-    # Charger le cascade Haar frontal (fourni par opencv)
-    cascade_path = os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml')
-    if not os.path.exists(cascade_path):
-        raise RuntimeError(f"Haarcascade introuvable à {cascade_path}")
-
-    face_cascade = cv2.CascadeClassifier(cascade_path)
-
-    # Récupérer la première frame (frame à t=0)
-    try:
-        frame0 = clip.get_frame(0.0)  # moviepy renvoie image RGB
-    except Exception as e:
-        # problème pour extraire la frame
-        raise RuntimeError(f"Impossible d'extraire la première frame: {e}")
-
-    # Extraire la ROI correspondant à la webcam
-    x1, y1, x2, y2 = WEBCAM_COORDS['x1'], WEBCAM_COORDS['y1'], WEBCAM_COORDS['x2'], WEBCAM_COORDS['y2']
-
-    # Clamp des coordonnées au cas où (sécurité)
-    h, w = frame0.shape[0], frame0.shape[1]
-    x1c = max(0, min(w - 1, x1))
-    x2c = max(0, min(w, x2))
-    y1c = max(0, min(h - 1, y1))
-    y2c = max(0, min(h, y2))
-
-    if x2c <= x1c or y2c <= y1c:
-        # zone invalide -> considérer comme aucun visage
-        return False
-
-    roi_rgb = frame0[y1c:y2c, x1c:x2c]  # moviepy: array RGB
-    # Convertir en niveaux de gris pour OpenCV (qui attend généralement BGR, mais conversion RGB->GRAY ok)
-    roi_gray = cv2.cvtColor(roi_rgb, cv2.COLOR_RGB2GRAY)
+    global _FACE_DETECTOR
+    detector = _get_face_detector()
+    if detector is not None:
+        # YuNet attend du BGR à la taille déclarée
+        roi = _sample_webcam_roi(input_path, "bgr24", _ROI_BUF)
+        detector.setInputSize((FACE_ROI_WIDTH, FACE_ROI_HEIGHT))
+        try:
+            _, faces = detector.detect(roi)
+            return faces is not None and len(faces) > 0
+        except cv2.error as e:
+            # OpenCV < 4.8 charge le modèle 2023mar mais ne sait pas l'exécuter
+            print(f"⚠️ YuNet indisponible ({e}), utilisation du cascade Haar.")
+            _FACE_DETECTOR = False
+
+    # Pour le cascade Haar, le plan Y du décodeur sert directement de niveaux de gris
+    roi = _sample_webcam_roi(input_path, "gray", _ROI_GRAY)
+
+    # Égalisation d'histogramme pour la robustesse du cascade Haar (sur place, dans _ROI_GRAY)
+    cv2.equalizeHist(roi, roi)
 
     # Détection
-    faces = face_cascade.detectMultiScale(roi_gray, scaleFactor=1.3, minNeighbors=5, minSize=(20, 20))
+    faces = _get_face_cascade().detectMultiScale(
+        roi, scaleFactor=1.2, minNeighbors=4, minSize=(40, 40),
+        flags=cv2.CASCADE_SCALE_IMAGE
+    )
 
     return len(faces) > 0
 
@@ -163,58 +663,178 @@ def process_gameplay_clip(input_path, output_path, max_duration_seconds, clip_da
     input_path: chemin vers le MP4 brut
     output_path: chemin où enregistrer le Short final
     clip_data doit contenir 'title', 'broadcaster_name', 'game_name'
+
+    Tout le montage (crop, scale, overlay, textes, séquence de fin) est fait
+    par un seul appel ffmpeg -filter_complex : les frames ne passent pas par Python.
+    Si la séquence de fin pré-encodée est compatible, elle est ajoutée ensuite
+    par simple copie de flux.
     """
+    global _CUDA_COMPOSITING
     # On ignore max_duration_seconds ici, on utilise MAX_DURATION
-    clip = load_clip(input_path)
-    duration = clip.duration
+    probe = probe_video(input_path)
+    video_stream = next(s for s in probe['streams'] if s.get('codec_type') == 'video')
 
-    # Vérifier si visage présent dans la zone webcam (sur la 1ère frame)
-    try:
-        face_in_webcam = is_face_in_webcam_zone(clip)
-    except RuntimeError as e:
-        # Remonter l'erreur mais fermer le clip proprement
-        clip.close()
-        raise
+    # Vérifier si visage présent dans la zone webcam (frame à FACE_SAMPLE_TIME, sinon la 1ère)
+    face_in_webcam = is_face_in_webcam_zone(input_path)
 
     # Construire les éléments visuels et textes
-    bg = create_background(duration)
-
     title_text = clip_data.get('title', 'Titre du clip')
     streamer   = clip_data.get('broadcaster_name', 'Streamer')
-    title_clip = create_text_clip(title_text, "Roboto-Bold.ttf", 70, 1.5, 'top', duration)
-    streamer_clip = create_text_clip(f"@{streamer}", "Roboto-Regular.ttf", 40, 0.5, 'bottom', duration)
-
-    if face_in_webcam:
+    texts = ",".join([
+        text_filter(title_text, "Roboto-Bold.ttf", 70, 1.5, 'top'),
+        text_filter(f"@{streamer}", "Roboto-Regular.ttf", 40, 0.5, 'bottom'),
+    ])
+
+    # Encodeur matériel si disponible (NVENC / QSV / VAAPI), sinon libx264
+    encoder = get_h264_encoder()
+
+    # Avec NVENC, découpe / redimensionnement / overlay restent sur le GPU si possible
+    use_cuda = (
+        encoder == "h264_nvenc"
+        and video_stream.get('codec_name') == 'h264'
+        and cuda_compositing_available()
+    )
+    render_args = (input_path, output_path, probe, face_in_webcam, texts, encoder)
+    if use_cuda:
+        try:
+            return _render_gameplay(*render_args, use_cuda=True)
+        except RuntimeError as e:
+            # Le test de cuda_compositing_available() ne couvre pas tous les clips : on refait sur CPU
+            _CUDA_COMPOSITING = False
+            print(f"⚠️ Montage GPU en échec ({e}), nouveau rendu sur CPU.")
+    return _render_gameplay(*render_args, use_cuda=False)
+
+def _render_gameplay(input_path, output_path, probe, face_in_webcam, texts, encoder, use_cuda):
+    """
+    Construit et lance la commande ffmpeg du Short (variante GPU si use_cuda).
+    """
+    duration = min(float(probe['format']['duration']), MAX_DURATION)
+    audio_stream = next((s for s in probe['streams'] if s.get('codec_type') == 'audio'), None)
+    has_audio = audio_stream is not None
+    video_stream = next(s for s in probe['streams'] if s.get('codec_type') == 'video')
+    src_w, src_h = int(video_stream['width']), int(video_stream['height'])
+    src_fps = source_fps_filter(video_stream)
+    global_args, hw_filter, encoder_args = h264_encoder_options(encoder)
+
+    inputs = ["-t", str(MAX_DURATION), "-i", input_path]
+    n_inputs = 1
+
+    # Positions calculées une fois ici : pas d'expression réévaluée à chaque frame (eval=init)
+    if use_cuda:
+        global_args = CUDA_GLOBAL_ARGS + global_args
+        if face_in_webcam:
+            cam_crop, cam_size, cam_x = webcam_cuvid_geometry(src_w, src_h)
+            game = gameplay_geometry(src_w, src_h)
+            inputs = (
+                cuvid_input(input_path, cam_crop, cam_size)
+                + cuvid_input(
+                    input_path,
+                    (WEBCAM_COORDS['y2'], 0, game['game_crop_x'], src_w - game['game_crop_w'] - game['game_crop_x']),
+                    (game['game_w'], GAME_H),
+                )
+                + create_background_input()
+            )
+            n_inputs = 3
+            graph = [_FILTER_FACE_CUDA.format(
+                src_fps=src_fps, texts=texts, cam_x=cam_x, game_x=game['game_x']
+            )]
+        else:
+            zoom = full_screen_geometry(src_w, src_h)
+            inputs = cuvid_input(
+                input_path,
+                (zoom['zoom_crop_y'], src_h - zoom['zoom_crop_h'] - zoom['zoom_crop_y'],
+                 zoom['zoom_crop_x'], src_w - zoom['zoom_crop_w'] - zoom['zoom_crop_x']),
+                RESOLUTION,
+            )
+            graph = [_FILTER_NOFACE_CUDA.format(src_fps=src_fps, texts=texts)]
+    elif face_in_webcam:
         # Comportement original : webcam visible + gameplay
-        webcam = extract_webcam(clip)
-        gameplay = extract_gameplay(clip)
-        overlays = [gameplay, webcam, title_clip, streamer_clip]
-        composed = CompositeVideoClip([bg] + overlays, size=RESOLUTION).set_audio(clip.audio)
+        inputs += create_background_input()
+        n_inputs += 1
+        graph = [_FILTER_FACE.format(src_fps=src_fps, texts=texts, **gameplay_geometry(src_w, src_h))]
     else:
         # Aucun visage dans la zone webcam : on ne montre PAS la webcam.
         # On zoom depuis le centre de la vidéo originelle pour remplir l'écran.
-        gameplay_full = full_screen_clip(clip)
-        overlays = [gameplay_full, title_clip, streamer_clip]
-        # On met le gameplay zoomé en arrière-plan (pas besoin du bg séparé)
-        composed = CompositeVideoClip(overlays, size=RESOLUTION).set_audio(clip.audio)
-
-    final = append_end_sequence(composed)
-
-    # Écriture du fichier
-    final.write_videofile(
-        output_path,
-        fps=30,
-        codec="libx264",
-        audio_codec="aac"
+        graph = [_FILTER_NOFACE.format(src_fps=src_fps, texts=texts, **full_screen_geometry(src_w, src_h))]
+
+    if has_audio:
+        audio = "0:a"
+    else:
+        # Piste silencieuse pour que la concaténation avec la fin fonctionne
+        inputs += ["-f", "lavfi", "-t", str(duration), "-i", f"anullsrc=r={AUDIO_RATE}:cl=stereo"]
+        audio = f"{n_inputs}:a"
+        n_inputs += 1
+
+    baked_end = baked_end_sequence(encoder)
+    end_path = None if baked_end else end_sequence_path()
+    if end_path:
+        inputs += ["-i", end_path]
+        end = n_inputs
+        n_inputs += 1
+        graph += [
+            f"[{end}:v]{end_sequence_filter()}[end_v]",
+            f"[main_v][{audio}][end_v][{end}:a]concat=n=2:v=1:a=1[out_v][out_a]",
+        ]
+        video, audio = "[out_v]", "[out_a]"
+    else:
+        video = "[main_v]"
+
+    if hw_filter:
+        graph.append(f"{video}{hw_filter}[enc_v]")
+        video = "[enc_v]"
+
+    # Piste audio d'origine non filtrée : copie directe si c'est déjà de l'AAC
+    # (compatible avec la fin pré-encodée si elle est ajoutée par copie)
+    audio_args = AUDIO_ARGS
+    if audio == "0:a" and audio_stream.get('codec_name') == 'aac' and (
+        not baked_end
+        or (audio_stream.get('sample_rate') == str(AUDIO_RATE) and audio_stream.get('channels') == 2)
+    ):
+        audio_args = ["-c:a", "copy"]
+
+    # Écriture du fichier (rendu principal seul si la fin est ajoutée par copie)
+    render_path = f"{os.path.splitext(output_path)[0]}_main.mp4" if baked_end else output_path
+    if FFMPEG_THREADS:
+        global_args = global_args + ["-filter_complex_threads", str(FFMPEG_THREADS)]
+    _run_ffmpeg(
+        global_args
+        + inputs
+        + ["-filter_complex", ";".join(graph)]
+        + ["-map", video, "-map", audio]
+        + encoder_args
+        + audio_args
+        + [render_path]
     )
 
-    # Fermer les clips pour libérer la mémoire
-    clip.close()
-    composed.close()
-    final.close()
+    if baked_end:
+        try:
+            concat_stream_copy([render_path, baked_end], output_path)
+        finally:
+            os.remove(render_path)
 
     return output_path
 
+def _init_worker():
+    # Limite les threads de chaque worker (encodeur, filtres ffmpeg, OpenCV) pour ne pas sursouscrire les cœurs
+    global FFMPEG_THREADS
+    FFMPEG_THREADS = WORKER_THREADS
+    if cv2 is not None:
+        cv2.setNumThreads(WORKER_THREADS)
+
+def _run_one(job):
+    return process_gameplay_clip(**job)
+
+def process_many(jobs, max_workers=None):
+    """
+    Traite plusieurs clips en parallèle, un process par clip.
+    jobs: liste de dicts avec les arguments de process_gameplay_clip
+    Retourne les chemins de sortie dans l'ordre des jobs.
+    """
+    if max_workers is None:
+        max_workers = max(1, (os.cpu_count() or 1) // 2)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as ex:
+        return list(ex.map(_run_one, jobs))
+
 # ------------------------------
 # Entrée en mode standalone (facultatif)
 # ------------------------------